@@ -1,8 +1,10 @@
 import sys
-import time
 from opentelemetry import trace
 from opentelemetry.sdk.trace import TracerProvider, Tracer
-from lib.tracing import init_tracer_provider
+from lib.tracing import init_tracer_provider, TRACE_DEBUG
+
+# attributes of the 'print-event' event never change, the SDK copies them into the event so one dict is shared
+_PRINT_EVENT_ATTRS = {'println': True}
 
 def say_hello(hello_to):
     # retrieve the global tracer provider
@@ -14,24 +16,30 @@ def say_hello(hello_to):
     # starting a new span for the 'say-hello' operation
     with tracer.start_as_current_span('say-hello') as span:
         # seting an attribute on the span
-        span.set_attribute("hello-to", hello_to)
+        if span.is_recording():
+            span.set_attribute("hello-to", hello_to)
 
-        hello_str = f'Hello, {hello_to}!'
+        hello_str = 'Hello, %s!' % hello_to
         
         # adding an event to the span indicating that the string has been formatted
-        span.add_event('string-format-event', {'string-formatted': hello_str})
+        if span.is_recording():
+            span.add_event('string-format-event', {'string-formatted': hello_str})
 
         # printing the greeting
         print(hello_str)
         
         # adding an event to the span indicating that the greeting has been printed
-        span.add_event('print-event', {'println': True})
+        if span.is_recording():
+            span.add_event('print-event', _PRINT_EVENT_ATTRS)
 
-        print(span.get_span_context())
+        if TRACE_DEBUG:
+            print(span.get_span_context())
 
 def main():
     # ensuring the program is called with one argument
-    assert len(sys.argv) == 2
+    # (checked before the tracer provider is created, and not with assert so that it also holds under python -O)
+    if len(sys.argv) != 2:
+        sys.exit('usage: python -m lesson01.solution.hello <name>')
 
     # setting and retrieving the global tracer provider
     tracer_provider: TracerProvider = init_tracer_provider('hello-world')
@@ -40,9 +48,6 @@ def main():
     
     say_hello(hello_to)
     
-    # Optional: yield to IOLoop to flush the spans
-    # time.sleep(2)  # Can be removed if shutdown() is sufficient
-    
     # shutting down the tracer provider to ensure all the spans are exported
     tracer_provider.shutdown()
 
@@ -1,43 +1,59 @@
 import sys
-import time
 from opentelemetry import trace
-from opentelemetry.sdk.trace import TracerProvider, Tracer, Span
-from lib.tracing import init_tracer_provider
+from opentelemetry.sdk.trace import TracerProvider, Span
+from lib.tracing import init_tracer_provider, TRACE_DEBUG
+
+# obtain a tracer instance once for the whole module; until init_tracer_provider runs this is a
+# proxy tracer that delegates to the global tracer provider as soon as it is set
+TRACER: trace.Tracer = trace.get_tracer("say_hello_tracer")
+
+# attributes of the 'print-event' event never change, the SDK copies them into the event so one dict is shared
+_PRINT_EVENT_ATTRS = {'printed': True}
 
 # ********************** FOURTH ATTEMPT **************************
 def say_hello(hello_to: str):
-    # obtain a tracer instance
-    tracer: Tracer = get_tracer("say_hello_tracer")
     # starting a new span for the 'say_hello' operation
-    with tracer.start_as_current_span('say_hello') as span:
+    with TRACER.start_as_current_span('say_hello') as span:
         # setting an attribute on the span
-        span.set_attribute("hello-to", hello_to)
+        if span.is_recording():
+            span.set_attribute("hello-to", hello_to)
         # calling the format_string function
         hello_str = format_string(hello_to)
         # calling the print_hello function
         print_hello(hello_str)
-        print(span.get_span_context())
+        if TRACE_DEBUG:
+            print(span.get_span_context())
 
 def format_string(hello_to: str):
-    # obtain a tracer instance from the tracer provider
-    tracer: Tracer = get_tracer("say_hello_tracer")
     # starting a new span for the 'format_string' operation
-    with tracer.start_as_current_span('format_string') as span:
-        hello_str = f'Hello, {hello_to}!'
+    with TRACER.start_as_current_span('format_string') as span:
+        hello_str = 'Hello, %s!' % hello_to
         # adding a log to the span indicating that 'string-format-event' event has occured
-        span.add_event('string-format-event', {'string-formatted': hello_str})
-        print(span.get_span_context())
+        if span.is_recording():
+            span.add_event('string-format-event', {'string-formatted': hello_str})
+        if TRACE_DEBUG:
+            print(span.get_span_context())
         return hello_str
 
 def print_hello(hello_str: str):
-    # obtain a tracer instance from the tracer provider
-    tracer: Tracer = get_tracer("say_hello_tracer")
-    # starting a new span for the 'print_hello' operation
-    with tracer.start_as_current_span('print_hello') as span:
+    # starting a new span for the 'print_hello' operation. Nothing below creates child spans, so the span
+    # does not need to be made current; start_span still uses the current 'say_hello' span as its parent
+    span: trace.Span = TRACER.start_span('print_hello')
+    try:
         print(hello_str)
         # adding a log to the span indicating that 'print-event' event has occured
-        span.add_event('print-event', {'printed': True})
-        print(span.get_span_context())
+        if span.is_recording():
+            span.add_event('print-event', _PRINT_EVENT_ATTRS)
+        if TRACE_DEBUG:
+            print(span.get_span_context())
+    except Exception as exc:
+        # recording the error on the span, as start_as_current_span would have done
+        span.record_exception(exc)
+        span.set_status(trace.Status(trace.StatusCode.ERROR))
+        raise
+    finally:
+        # ending the span so that it gets exported properly
+        span.end()
 
 
 # ********************** THIRD ATTEMPT **************************
@@ -155,16 +171,11 @@ def print_hello(hello_str: str):
 #     # adding a log to the span indicating that 'print-event' event has occured
 #     root_span.add_event('print-event', {'printed': True})
 
-def get_tracer(tracer_name: str):
-    # retrieve the global tracer provider
-    tracer_provider: TracerProvider = trace.get_tracer_provider()
-    # obtain a tracer instance from the tracer provider
-    tracer: Tracer = tracer_provider.get_tracer(tracer_name)
-    return tracer
-
 def main():
     # ensuring the program is called with one argument
-    assert len(sys.argv) == 2
+    # (checked before the tracer provider is created, and not with assert so that it also holds under python -O)
+    if len(sys.argv) != 2:
+        sys.exit('usage: python -m lesson02.solution.hello <name>')
     
     # setting and retrieving the global tracer provider
     tracer_provider: TracerProvider = init_tracer_provider('hello-world')
@@ -172,9 +183,6 @@ def main():
     hello_to = sys.argv[1]
     say_hello(hello_to)
     
-    # Optional: yield to IOLoop to flush the spans
-    # time.sleep(2)  # Can be removed if shutdown() is sufficient
-
     # shutting down the tracer provider to ensure all the spans are exported
     tracer_provider.shutdown()
 
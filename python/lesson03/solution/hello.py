@@ -1,73 +1,92 @@
+import atexit
 import requests
+import requests.adapters
 import sys
-import time
+from urllib.parse import quote
 from opentelemetry import trace, propagate
-from opentelemetry.sdk.trace import TracerProvider, Tracer
-from lib.tracing import init_tracer_provider
+from opentelemetry.sdk.trace import TracerProvider
+from lib.tracing import init_tracer_provider, TRACE_DEBUG
 from opentelemetry.semconv.trace import SpanAttributes
 
+# obtain a tracer instance once for the whole module; until init_tracer_provider runs this is a
+# proxy tracer that delegates to the global tracer provider as soon as it is set
+TRACER: trace.Tracer = trace.get_tracer("say_hello_tracer")
+
+# attributes of the 'print-event' event never change, the SDK copies them into the event so one dict is shared
+_PRINT_EVENT_ATTRS = {'printed': True}
+
+# a single HTTP session shared by every http_get call, so that keep-alive connections to the
+# formatter and publisher services are pooled and reused instead of reconnecting on every request
+_SESSION = requests.Session()
+_SESSION.mount("http://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16))
+# releasing the pooled connections when the program exits
+atexit.register(_SESSION.close)
+
+# semantic convention attribute keys set on every outgoing request, resolved once at import
+_HTTP_METHOD_KEY = SpanAttributes.HTTP_METHOD
+_HTTP_URL_KEY = SpanAttributes.HTTP_URL
+
 def say_hello(hello_to):
-    # obtain a tracer instance
-    tracer: Tracer = get_tracer("say_hello_tracer")
     # starting a new span for the 'say_hello' operation
-    with tracer.start_as_current_span('say_hello') as span:
+    with TRACER.start_as_current_span('say_hello') as span:
         # setting an attribute on the span
-        span.set_attribute("hello-to", hello_to)
+        if span.is_recording():
+            span.set_attribute("hello-to", hello_to)
         # calling the format_string function
         hello_str = format_string(hello_to)
         # calling the print_hello function
         print_hello(hello_str)
-        print(span.get_span_context())
+        if TRACE_DEBUG:
+            print(span.get_span_context())
 
 def format_string(hello_to):
-    # obtain a tracer instance
-    tracer: Tracer = get_tracer("say_hello_tracer")
     # starting a new span for the 'format_string' operation
-    with tracer.start_as_current_span('format_string') as span:
+    with TRACER.start_as_current_span('format_string') as span:
         hello_str = http_get(8081, 'format', 'helloTo', hello_to)
         # adding a log to the span indicating that 'string-format-event' event has occured
-        span.add_event('string-format-event', {'string-formatted': hello_str})
-        print(span.get_span_context())
+        if span.is_recording():
+            span.add_event('string-format-event', {'string-formatted': hello_str})
+        if TRACE_DEBUG:
+            print(span.get_span_context())
         return hello_str  
 
 def print_hello(hello_str):
-    # obtain a tracer instance
-    tracer: Tracer = get_tracer("say_hello_tracer")
     # starting a new span for the 'print_hello' operation
-    with tracer.start_as_current_span('print_hello') as span:
+    with TRACER.start_as_current_span('print_hello') as span:
         http_get(8082, 'publish', 'helloStr', hello_str)
         # adding a log to the span indicating that 'print-event' event has occured
-        span.add_event('print-event', {'printed': True})
-        print(span.get_span_context())
+        if span.is_recording():
+            span.add_event('print-event', _PRINT_EVENT_ATTRS)
+        if TRACE_DEBUG:
+            print(span.get_span_context())
 
-def http_get(port, path, param, value):
-    url = 'http://localhost:%s/%s' % (port, path)
+# the trailing underscore arguments bind the OpenTelemetry callables once at definition time so that they are
+# plain local lookups on every request, they are not meant to be passed by callers
+def http_get(port: int, path, param, value, _get_current_span=trace.get_current_span, _inject=propagate.inject):
+    url = 'http://localhost:%d/%s' % (port, path)
+    # building the query string directly, there is only ever a single parameter to encode
+    full_url = '%s?%s=%s' % (url, quote(param, safe=''), quote(value, safe=''))
     # retrieving the current active span
-    span = trace.get_current_span()
+    span = _get_current_span()
     # setting HTTP method and URL attributes on the span
-    span.set_attribute(SpanAttributes.HTTP_METHOD, 'GET')
-    span.set_attribute(SpanAttributes.HTTP_URL, url)
+    if span.is_recording():
+        span.set_attributes({_HTTP_METHOD_KEY: 'GET', _HTTP_URL_KEY: url})
     # iniecting the span context into the HTTP headers for trace propagation
-    headers = {}
-    propagate.inject(headers)
+    headers: dict[str, str] = {}
+    _inject(headers)
     
     # print(f"headers: {headers}")
     
     # sending the HTTP GET request with the propagated headers
-    resp = requests.get(url, params={param: value}, headers=headers)
+    resp = _SESSION.get(full_url, headers=headers, timeout=5)
     resp.raise_for_status()
     return resp.text
 
-def get_tracer(tracer_name: str):
-    # retrieve the global tracer provider
-    tracer_provider: TracerProvider = trace.get_tracer_provider()
-    # obtain a tracer instance from the tracer provider
-    tracer: Tracer = tracer_provider.get_tracer(tracer_name)
-    return tracer
-
 def main():
     # ensuring the program is called with one argument
-    assert len(sys.argv) == 2
+    # (checked before the tracer provider is created, and not with assert so that it also holds under python -O)
+    if len(sys.argv) != 2:
+        sys.exit('usage: python -m lesson03.solution.hello <name>')
     
     # setting and retrieving the global tracer provider
     tracer_provider: TracerProvider = init_tracer_provider('hello-world')
@@ -75,9 +94,6 @@ def main():
     hello_to = sys.argv[1]
     say_hello(hello_to)
     
-    # Optional: yield to IOLoop to flush the spans
-    # time.sleep(2)  # Can be removed if shutdown() is sufficient
-
     # shutting down the tracer provider to ensure all the spans are exported
     tracer_provider.shutdown()
 
@@ -1,45 +1,50 @@
 from flask import Flask, request
+from waitress import serve
 from opentelemetry import propagate, trace
-from opentelemetry.sdk.trace import TracerProvider, Tracer
-from lib.tracing import init_tracer_provider
+from opentelemetry.sdk.trace import TracerProvider
+from lib.tracing import init_tracer_provider, env_flag, TRACE_DEBUG
+
+# obtain a tracer instance once for the whole module; until init_tracer_provider runs this is a
+# proxy tracer that delegates to the global tracer provider as soon as it is set
+TRACER: trace.Tracer = trace.get_tracer("publisher-tracer")
+
+# attributes of the 'print-event' event never change, the SDK copies them into the event so one dict is shared
+_PRINT_EVENT_ATTRS = {'println': True}
 
 app = Flask(__name__)
 
+# propagate.extract is bound as a default argument so that it is a local lookup on every request
 @app.route("/publish")
-def publish():
-    # obtain a tracer instance
-    tracer: Tracer = get_tracer("publisher-tracer")
-
+def publish(_extract=propagate.extract):
     # uncomment the following line to see the request headers
     # print(f"carrier: {request.headers} \nType: {type(request.headers)}")
 
     # extracting the span context from the request headers
-    ctx = propagate.extract(carrier=request.headers)
+    ctx = _extract(carrier=request.headers)
     
     # print("context:", ctx)
     
     # starting a new span for the request
-    with tracer.start_as_current_span('publish', context=ctx) as span:
+    with TRACER.start_as_current_span('publish', context=ctx) as span:
         hello_str = request.args.get('helloStr')
         print(hello_str)
         # adding an event to the span indicating that request for publishing has been completed
-        span.add_event('print-event', {'println': True})
-        print(span.get_span_context())
+        if span.is_recording():
+            span.add_event('print-event', _PRINT_EVENT_ATTRS)
+        if TRACE_DEBUG:
+            print(span.get_span_context())
         return "Published"
 
-def get_tracer(tracer_name: str):
-    # retrieve the global tracer provider
-    tracer_provider: TracerProvider = trace.get_tracer_provider()
-    # obtain a tracer instance from the tracer provider
-    tracer: Tracer = tracer_provider.get_tracer(tracer_name)
-    return tracer
-
 def main():
     # setting and retrieving the global tracer provider
     tracer_provider: TracerProvider = init_tracer_provider('publisher')
 
-    # starting the flask app on port 8082
-    app.run(port=8082)
+    if env_flag("FLASK_DEV"):
+        # starting the flask development server on port 8082
+        app.run(port=8082)
+    else:
+        # serving the flask app on port 8082 with waitress, which handles concurrent requests on a pool of threads
+        serve(app, host='127.0.0.1', port=8082, threads=8)
     # shutting down the tracer provider to ensure all the spans are exported
     tracer_provider.shutdown()
 
@@ -1,93 +1,122 @@
+import atexit
 import requests
+import requests.adapters
 import sys
-import time
+from typing import Callable
+from urllib.parse import quote
 from opentelemetry import trace, propagate, baggage
-from opentelemetry.sdk.trace import TracerProvider, Tracer
-from lib.tracing import init_tracer_provider
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace import TracerProvider
+from lib.tracing import init_tracer_provider, TRACE_DEBUG
 from opentelemetry.semconv.trace import SpanAttributes
 from opentelemetry.baggage.propagation import W3CBaggagePropagator
 
+# obtain a tracer instance once for the whole module; until init_tracer_provider runs this is a
+# proxy tracer that delegates to the global tracer provider as soon as it is set
+TRACER: trace.Tracer = trace.get_tracer("say_hello_tracer")
+
+# attributes of the 'print-event' event never change, the SDK copies them into the event so one dict is shared
+_PRINT_EVENT_ATTRS = {'printed': True}
+
+# a single HTTP session shared by every http_get call, so that keep-alive connections to the
+# formatter and publisher services are pooled and reused instead of reconnecting on every request
+_SESSION = requests.Session()
+_SESSION.mount("http://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16))
+# releasing the pooled connections when the program exits
+atexit.register(_SESSION.close)
+
+# semantic convention attribute keys set on every outgoing request, resolved once at import
+_HTTP_METHOD_KEY = SpanAttributes.HTTP_METHOD
+_HTTP_URL_KEY = SpanAttributes.HTTP_URL
+
+# the baggage propagator is stateless, so one instance is shared by every request
+_BAGGAGE_PROP = W3CBaggagePropagator()
+
 def say_hello(hello_to, greeting):
-    # obtain a tracer instance
-    tracer: Tracer = get_tracer("say_hello_tracer")
     # starting a new span for the 'say_hello' operation
-    with tracer.start_as_current_span('say_hello') as span:
+    with TRACER.start_as_current_span('say_hello') as span:
         # setting an attribute on the span
-        span.set_attribute("hello-to", hello_to)
+        if span.is_recording():
+            span.set_attribute("hello-to", hello_to)
         # calling the format_string function
         hello_str = format_string(hello_to, {"greeting": greeting})
         # calling the print_hello function
         print_hello(hello_str)        
-        print(span.get_span_context())
+        if TRACE_DEBUG:
+            print(span.get_span_context())
 
 # note the change in the function signature, it now also requires a python dictionary inorder to add items to the baggage
-def format_string(hello_to, baggage_to_add: dict=None):
-    # obtain a tracer instance
-    tracer: Tracer = get_tracer("say_hello_tracer")
+def format_string(hello_to, baggage_to_add: dict[str, str] | None = None):
     # starting a new span for the 'format_string' operation
-    with tracer.start_as_current_span('format_string') as span:
+    with TRACER.start_as_current_span('format_string') as span:
         hello_str = http_get(8081, 'format', 'helloTo', hello_to, baggage_to_add)
         # adding a log to the span indicating that 'string-format-event' event has occured
-        span.add_event('string-format-event', {'string-formatted': hello_str})
-        print(span.get_span_context())
+        if span.is_recording():
+            span.add_event('string-format-event', {'string-formatted': hello_str})
+        if TRACE_DEBUG:
+            print(span.get_span_context())
         return hello_str  
 
 def print_hello(hello_str):
-    # obtain a tracer instance
-    tracer: Tracer = get_tracer("say_hello_tracer")
     # starting a new span for the 'print_hello' operation
-    with tracer.start_as_current_span('print_hello') as span:
+    with TRACER.start_as_current_span('print_hello') as span:
         http_get(8082, 'publish', 'helloStr', hello_str)
         # adding a log to the span indicating that 'print-event' event has occured
-        span.add_event('print-event', {'printed': True})
-        print(span.get_span_context())
+        if span.is_recording():
+            span.add_event('print-event', _PRINT_EVENT_ATTRS)
+        if TRACE_DEBUG:
+            print(span.get_span_context())
 
-# note the change in the function signature, it now also requires the context that contains the baggage in order to propagate the baggage
-def http_get(port, path, param, value, baggage_to_add: dict = None):
-    url = 'http://localhost:%s/%s' % (port, path)
+# note the change in the function signature, it now also requires the context that contains the baggage in order to propagate the baggage.
+# the trailing underscore arguments bind the OpenTelemetry callables once at definition time so that they are
+# plain local lookups on every request, they are not meant to be passed by callers
+def http_get(port: int, path: str, param: str, value: str, baggage_to_add: dict[str, str] | None = None,
+             _get_current_span: Callable[[], trace.Span] = trace.get_current_span,
+             _inject: Callable[[dict[str, str]], None] = propagate.inject,
+             _set_baggage: Callable[..., Context] = baggage.set_baggage,
+             _baggage_prop: W3CBaggagePropagator = _BAGGAGE_PROP) -> str:
+    url: str = 'http://localhost:%d/%s' % (port, path)
+    # building the query string directly, there is only ever a single parameter to encode
+    full_url: str = '%s?%s=%s' % (url, quote(param, safe=''), quote(value, safe=''))
     # retrieving the current active span
-    span = trace.get_current_span()
+    span = _get_current_span()
     # setting HTTP method and URL attributes on the span
-    span.set_attribute(SpanAttributes.HTTP_METHOD, 'GET')
-    span.set_attribute(SpanAttributes.HTTP_URL, url)
+    if span.is_recording():
+        span.set_attributes({_HTTP_METHOD_KEY: 'GET', _HTTP_URL_KEY: url})
 
     # iniecting the span context into the HTTP headers for trace propagation
-    headers = {}
-    propagate.inject(headers)
+    headers: dict[str, str] = {}
+    _inject(headers)
 
     # print(f"headers: {headers}")
 
     # setting baggage to propagate custom data across span boundaries.
     # Baggage items consist of a name, value, and context. The context is obtained from the current span scope
     # and is automatically updated with the new baggage item by the OpenTelemetry SDK.
-    ctx = None
-    if baggage_to_add is not None and isinstance(baggage_to_add, dict):
+    # without any baggage to add, the headers already carry the trace context and are sent as they are
+    if baggage_to_add:
+        ctx: Context | None = None
         for k, v in baggage_to_add.items():
-            ctx = baggage.set_baggage(name=k, value=v, context=ctx)
+            ctx = _set_baggage(name=k, value=v, context=ctx)
         
         # uncomment to see the baggage context 
         # print(f"http_get: context: {ctx}")
     
-    # injecting the baggage into the request headers form the context ctx for baggage propagation
-    W3CBaggagePropagator().inject(headers, context=ctx)
+        # injecting the baggage into the request headers form the context ctx for baggage propagation
+        _baggage_prop.inject(headers, context=ctx)
     
     # print(f"headers: {headers}")
 
     # sending the HTTP GET request with the propagated headers
-    resp = requests.get(url, params={param: value}, headers=headers)
+    resp = _SESSION.get(full_url, headers=headers, timeout=5)
     resp.raise_for_status()
     return resp.text
   
-def get_tracer(tracer_name: str):
-    # retrieve the global tracer provider
-    tracer_provider: TracerProvider = trace.get_tracer_provider()
-    # obtain a tracer instance from the tracer provider
-    tracer: Tracer = tracer_provider.get_tracer(tracer_name)
-    return tracer
-
 def main():
     # ensuring the program is called with two argument
-    assert len(sys.argv) == 3
+    # (checked before the tracer provider is created, and not with assert so that it also holds under python -O)
+    if len(sys.argv) != 3:
+        sys.exit('usage: python -m lesson04.solution.hello <name> <greeting>')
     
     # setting and retrieving the global tracer provider
     tracer_provider: TracerProvider = init_tracer_provider('hello-world')
@@ -96,9 +125,6 @@ def main():
     greeting = sys.argv[2]
     say_hello(hello_to, greeting)
     
-    # Optional: yield to IOLoop to flush the spans
-    # time.sleep(2)  # Can be removed if shutdown() is sufficient
-
     # shutting down the tracer provider to ensure all the spans are exported
     tracer_provider.shutdown()
 
@@ -1,29 +1,115 @@
+import logging
+import os
+from typing import Any
 from opentelemetry import trace, propagate
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.resources import SERVICE_NAME, Resource
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
+from opentelemetry.exporter.otlp.proto.http import Compression
 from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
 from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
 
+_logger = logging.getLogger(__name__)
+
 # Tracing Backend URL
-TRACING_BACKEND = "http://localhost:4318/v1/traces"
+TRACING_BACKEND: str = "http://localhost:4318/v1/traces"
+
+# reading an integer environment variable; like the SDK, an invalid value is reported and the default
+# is used instead of failing at import
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        _logger.warning("Unable to parse value for %s as integer. Defaulting to %s.", name, default)
+        return default
+
+# reading an on/off environment variable; unset, empty, '0' and 'false' mean off
+def env_flag(name: str) -> bool:
+    return os.getenv(name, "").lower() not in ("", "0", "false")
+
+# printing span contexts is only useful while debugging, set TRACE_DEBUG=1 to enable it
+TRACE_DEBUG: bool = env_flag("TRACE_DEBUG")
+
+# Batch span processor settings, tuned for bursty workloads (bigger queue so bursts are not dropped,
+# smaller batches and shorter delays so spans are flushed sooner and shutdown returns faster).
+# Each one can still be overridden with the standard OTEL_BSP_* environment variables
+BSP_MAX_QUEUE_SIZE: int = _env_int("OTEL_BSP_MAX_QUEUE_SIZE", 4096)
+BSP_SCHEDULE_DELAY_MILLIS: int = _env_int("OTEL_BSP_SCHEDULE_DELAY", 1000)
+BSP_MAX_EXPORT_BATCH_SIZE: int = _env_int("OTEL_BSP_MAX_EXPORT_BATCH_SIZE", 256)
+BSP_EXPORT_TIMEOUT_MILLIS: int = _env_int("OTEL_BSP_EXPORT_TIMEOUT", 10000)
+
+# tracer provider that remembers whether it was shut down, so init_tracer_provider can replace it afterwards
+class _LessonTracerProvider(TracerProvider):
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.is_shut_down: bool = False
+        # provider that replaced this one after it was shut down
+        self.successor: TracerProvider | None = None
+
+    def shutdown(self) -> None:
+        super().shutdown()
+        self.is_shut_down = True
+
+    def get_tracer(self, *args: Any, **kwargs: Any) -> trace.Tracer:
+        # the global tracer provider can only be set once, so when this is the global provider and it was replaced,
+        # tracers obtained through the global provider (e.g. with trace.get_tracer) come from its replacement
+        if self.successor is not None:
+            return self.successor.get_tracer(*args, **kwargs)
+        return super().get_tracer(*args, **kwargs)
+
+# tracer provider created by init_tracer_provider, kept so that repeated calls reuse it until it is shut down
+_PROVIDER: _LessonTracerProvider | None = None
+
+# warning when an existing provider is reused for a different service, its spans keep the original service name
+def _check_service(tracer_provider: TracerProvider, service: str) -> None:
+    current_service = tracer_provider.resource.attributes.get(SERVICE_NAME)
+    if current_service != service:
+        _logger.warning("Tracer provider already initialized for service %r, reusing it for %r", current_service, service)
 
 # initialize the tracer provider
 def init_tracer_provider(service: str, backend: str = TRACING_BACKEND) -> TracerProvider:    
-    # creating an OTLP HTTP exporter
-    otlp_exporter = OTLPSpanExporter(endpoint=backend)
+    global _PROVIDER
+    # calling this again (e.g. when several lessons are run in one process) returns the existing provider instead of
+    # starting another exporter and worker thread, as long as that provider has not been shut down
+    if _PROVIDER is not None and not _PROVIDER.is_shut_down:
+        _check_service(_PROVIDER, service)
+        return _PROVIDER
+    # a tracer provider set up outside of this helper is used as it is
+    current_provider = trace.get_tracer_provider()
+    if isinstance(current_provider, TracerProvider) and not isinstance(current_provider, _LessonTracerProvider):
+        _check_service(current_provider, service)
+        return current_provider
+
+    # creating an OTLP HTTP exporter, gzip-compressing the exported batches to cut down the bytes sent per export
+    otlp_exporter: OTLPSpanExporter = OTLPSpanExporter(endpoint=backend, compression=Compression.Gzip)
 
     # creating a tracer provider with the OTLP exporter
-    tracer_provider = TracerProvider(resource=Resource.create({SERVICE_NAME: service}))
+    tracer_provider = _LessonTracerProvider(resource=Resource.create({SERVICE_NAME: service}))
 
     # adding a span processor to the tracer provider to handle span export
-    tracer_provider.add_span_processor(BatchSpanProcessor(otlp_exporter))
+    tracer_provider.add_span_processor(
+        BatchSpanProcessor(
+            otlp_exporter,
+            max_queue_size=BSP_MAX_QUEUE_SIZE,
+            schedule_delay_millis=BSP_SCHEDULE_DELAY_MILLIS,
+            max_export_batch_size=BSP_MAX_EXPORT_BATCH_SIZE,
+            export_timeout_millis=BSP_EXPORT_TIMEOUT_MILLIS,
+        )
+    )
 
-    # setting the global tracer provider to the one we just created 
-    trace.set_tracer_provider(tracer_provider)
+    # setting the global tracer provider to the one we just created, or, when a provider that was shut down is
+    # already the global one (it cannot be overridden), letting that provider hand out tracers from the new one
+    if isinstance(current_provider, _LessonTracerProvider):
+        current_provider.successor = tracer_provider
+    else:
+        trace.set_tracer_provider(tracer_provider)
 
     # setting up a propagator to propagate traces and baggage accross microservices
     propagate.set_global_textmap(TraceContextTextMapPropagator())
 
+    _PROVIDER = tracer_provider
     return tracer_provider
 